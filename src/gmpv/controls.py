@@ -4,6 +4,8 @@ gi.require_version("Gtk", "4.0")
 gi.require_version("Adw", "1")
 from gi.repository import Adw, Gio, GLib, GObject, Gtk
 
+from gmpv.player import SPEED_STEPS
+
 
 def _format_time(seconds):
     if seconds is None or seconds < 0:
@@ -78,6 +80,7 @@ class ControlsBar(Gtk.Box):
         )
         self._player = player
         self._seeking = False
+        self._menu_entries = {"sub": [], "audio": []}
         self._load_css()
         self._setup_ui()
         self._connect_signals()
@@ -154,13 +157,21 @@ class ControlsBar(Gtk.Box):
 
         transport_row.append(center_group)
 
-        # Right group: subtitle, audio, fullscreen
+        # Right group: speed, subtitle, audio, fullscreen
         right_group = Gtk.Box(
             orientation=Gtk.Orientation.HORIZONTAL,
             spacing=4,
             halign=Gtk.Align.END,
         )
 
+        self._speed_button = Gtk.MenuButton(label="1×")
+        self._speed_button.add_css_class("flat")
+        speed_menu = Gio.Menu()
+        for speed in SPEED_STEPS:
+            speed_menu.append(f"{speed:g}×", f"win.set-speed::{speed:g}")
+        self._speed_button.set_menu_model(speed_menu)
+        right_group.append(self._speed_button)
+
         self._sub_button = Gtk.MenuButton(icon_name="media-view-subtitles-symbolic")
         self._sub_button.add_css_class("flat")
         self._sub_button.add_css_class("circular")
@@ -195,6 +206,17 @@ class ControlsBar(Gtk.Box):
         self._player.connect("pause-changed", self._on_pause_changed)
         self._player.connect("volume-changed", self._on_player_volume_changed)
         self._player.connect("track-list-changed", self._on_track_list_changed)
+        self._player.connect("speed-changed", self._on_speed_changed)
+        self._player.connect("display-fps-changed", self._on_speed_changed)
+        self._player.connect("file-loaded", self._on_file_loaded)
+
+    def set_markers(self, mark_a, mark_b):
+        """Show the export A/B markers on the seek bar; None hides one."""
+        self._seek_scale.clear_marks()
+        if mark_a is not None:
+            self._seek_scale.add_mark(mark_a, Gtk.PositionType.TOP, "A")
+        if mark_b is not None:
+            self._seek_scale.add_mark(mark_b, Gtk.PositionType.TOP, "B")
 
     def _on_play_pause(self, button):
         self._player.play_pause()
@@ -233,19 +255,40 @@ class ControlsBar(Gtk.Box):
     def _on_player_volume_changed(self, player, volume):
         self._volume_button.set_value(volume / 100.0)
 
+    def _on_speed_changed(self, player, value):
+        label = f"{player.speed:g}×"
+        if player.trick_play:
+            label += f" · {player.display_fps:.0f} fps"
+        self._speed_button.set_label(label)
+
+    def _on_file_loaded(self, player):
+        self._speed_button.set_sensitive(not player.live)
+
     def _on_track_list_changed(self, player):
         self._update_track_menu("sub", self._sub_menu)
         self._update_track_menu("audio", self._audio_menu)
 
     def _update_track_menu(self, track_type, menu):
-        menu.remove_all()
-        tracks = self._player.get_tracks_by_type(track_type)
         prop = "sid" if track_type == "sub" else "aid"
-
+        entries = []
         if track_type == "sub":
-            menu.append("None", f"win.set-track-{prop}::no")
-
-        for track in tracks:
+            entries.append(("None", f"win.set-track-{prop}::no"))
+        for track in self._player.get_tracks_by_type(track_type):
             tid = track.get("id", 0)
             title = track.get("title") or track.get("lang") or f"Track {tid}"
-            menu.append(title, f"win.set-track-{prop}::{tid}")
+            entries.append((title, f"win.set-track-{prop}::{tid}"))
+
+        # mpv republishes the whole track list whenever the selection
+        # changes, so usually there is nothing to do. Otherwise keep the
+        # common prefix and only replace the items after it.
+        old = self._menu_entries[track_type]
+        if entries == old:
+            return
+        keep = 0
+        while keep < min(len(old), len(entries)) and old[keep] == entries[keep]:
+            keep += 1
+        for index in range(len(old) - 1, keep - 1, -1):
+            menu.remove(index)
+        for title, action in entries[keep:]:
+            menu.append(title, action)
+        self._menu_entries[track_type] = entries
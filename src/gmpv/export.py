@@ -0,0 +1,247 @@
+import os
+import shutil
+import time
+
+from gi.repository import Gio, GLib, GObject
+
+# How far before the A marker to look for the keyframe the clip starts on.
+_KEYFRAME_SEARCH_S = 30.0
+
+
+def _stamp(seconds):
+    seconds = int(seconds)
+    h, remainder = divmod(seconds, 3600)
+    m, s = divmod(remainder, 60)
+    if h > 0:
+        return f"{h}h{m:02d}m{s:02d}s"
+    return f"{m:02d}m{s:02d}s"
+
+
+def output_path_for(source, start, end):
+    """Reserve a free ``<stem>.<start>-<end><ext>`` path next to ``source``.
+
+    The file is created empty, so a second export of the same range picks
+    the next name instead of writing over this one. Raises OSError if the
+    directory is not writable.
+    """
+    stem, ext = os.path.splitext(source)
+    base = f"{stem}.{_stamp(start)}-{_stamp(end)}"
+    path = base + ext
+    n = 1
+    while True:
+        try:
+            os.close(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644))
+            return path
+        except FileExistsError:
+            n += 1
+            path = f"{base}.{n}{ext}"
+
+
+def _partial_path(output):
+    stem, ext = os.path.splitext(output)
+    # Keep the extension, ffmpeg picks the container from it.
+    return f"{stem}.part{ext}"
+
+
+def _low_priority():
+    # Keep exports from competing with playback for CPU and disk.
+    prefix = ["nice", "-n", "10"]
+    if shutil.which("ionice"):
+        prefix += ["ionice", "-c", "3"]
+    return prefix
+
+
+class ExportJob(GObject.Object):
+    """Copies ``start``-``end`` of ``source`` to ``output`` without re-encoding.
+
+    The start is moved back to the nearest keyframe at or before ``start``
+    (found with ffprobe) so the clip begins with a decodable frame. ffmpeg
+    then stream-copies the range at low CPU and I/O priority, reporting
+    progress through ``-progress``.
+
+    ``start`` and ``end`` are in mpv's playback time, which starts at 0.
+    ffprobe reports container timestamps, which start at the file's
+    ``start_time`` (far from 0 for MPEG-TS). ffmpeg's input ``-ss`` is
+    relative to that again, so the keyframe search converts both ways.
+
+    ``output`` must already be reserved (see ``output_path_for``); the job
+    owns it and removes it if the export fails. ffmpeg writes to a
+    ``.part`` file next to it that replaces it once the copy succeeded.
+    """
+
+    __gsignals__ = {
+        "progress": (GObject.SignalFlags.RUN_LAST, None, (float,)),
+        "finished": (GObject.SignalFlags.RUN_LAST, None, (bool, str)),
+    }
+
+    def __init__(self, source, start, end, output=None):
+        super().__init__()
+        self.source = source
+        self.start = start
+        self.end = end
+        self.output = output or output_path_for(source, start, end)
+        self.snapped_start = start
+        self.start_time = 0.0
+        self.fraction = 0.0
+        self.speed = 0.0
+        self._partial = _partial_path(self.output)
+        self._process = None
+        self._cancellable = Gio.Cancellable()
+        self._started_at = None
+        self._open_streams = 0
+        self._error = ""
+
+    def run(self):
+        self._probe(
+            ["-show_entries", "format=start_time", "-of", "csv=p=0"],
+            self._on_start_time_done,
+        )
+
+    def _probe(self, args, callback):
+        try:
+            probe = Gio.Subprocess.new(
+                ["ffprobe", "-v", "error"] + args + [self.source],
+                Gio.SubprocessFlags.STDOUT_PIPE | Gio.SubprocessFlags.STDERR_SILENCE,
+            )
+        except GLib.Error as e:
+            self._finish(False, e.message)
+            return
+        probe.communicate_utf8_async(None, self._cancellable, callback)
+
+    def _on_start_time_done(self, probe, result):
+        try:
+            _, stdout, _ = probe.communicate_utf8_finish(result)
+        except GLib.Error as e:
+            self._finish(False, e.message)
+            return
+        try:
+            self.start_time = float((stdout or "").strip().rstrip(","))
+        except ValueError:
+            self.start_time = 0.0
+        search_from = self.start_time + max(self.start - _KEYFRAME_SEARCH_S, 0)
+        search_to = self.start_time + self.start + 0.001
+        self._probe(
+            [
+                "-select_streams", "v:0", "-skip_frame", "nokey",
+                "-show_entries", "frame=best_effort_timestamp_time", "-of", "csv=p=0",
+                "-read_intervals", f"{search_from:.6f}%{search_to:.6f}",
+            ],
+            self._on_probe_done,
+        )
+
+    def cancel(self):
+        self._cancellable.cancel()
+        if self._process:
+            self._process.force_exit()
+
+    def _on_probe_done(self, probe, result):
+        try:
+            _, stdout, _ = probe.communicate_utf8_finish(result)
+        except GLib.Error as e:
+            self._finish(False, e.message)
+            return
+        keyframes = []
+        for line in (stdout or "").splitlines():
+            try:
+                keyframes.append(float(line.strip().rstrip(",")) - self.start_time)
+            except ValueError:
+                continue
+        before = [t for t in keyframes if t <= self.start + 0.001]
+        if before:
+            self.snapped_start = max(before)
+        self._start_copy()
+
+    def _start_copy(self):
+        # Left over from an earlier run that was killed; the name is ours
+        # since the output next to it is reserved.
+        try:
+            os.unlink(self._partial)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self._finish(False, e.strerror)
+            return
+        args = _low_priority() + [
+            "ffmpeg", "-hide_banner", "-nostdin", "-loglevel", "error",
+            "-ss", f"{self.snapped_start:.6f}", "-i", self.source,
+            "-t", f"{self.end - self.snapped_start:.6f}",
+            "-map", "0", "-c", "copy", "-avoid_negative_ts", "make_zero",
+            "-progress", "pipe:1", "-nostats",
+            self._partial,
+        ]
+        try:
+            self._process = Gio.Subprocess.new(
+                args, Gio.SubprocessFlags.STDOUT_PIPE | Gio.SubprocessFlags.STDERR_PIPE,
+            )
+        except GLib.Error as e:
+            self._finish(False, e.message)
+            return
+        self._started_at = time.monotonic()
+        # stderr is drained while ffmpeg runs, a full pipe would block it.
+        self._open_streams = 2
+        stdout = Gio.DataInputStream.new(self._process.get_stdout_pipe())
+        stdout.read_line_async(GLib.PRIORITY_LOW, self._cancellable, self._on_progress_line)
+        stderr = Gio.DataInputStream.new(self._process.get_stderr_pipe())
+        stderr.read_line_async(GLib.PRIORITY_LOW, self._cancellable, self._on_error_line)
+
+    def _stream_closed(self):
+        self._open_streams -= 1
+        if self._open_streams == 0:
+            self._process.wait_async(None, self._on_copy_done)
+
+    def _on_error_line(self, stream, result):
+        try:
+            line, _ = stream.read_line_finish_utf8(result)
+        except GLib.Error:
+            line = None
+        if line is None:
+            self._stream_closed()
+            return
+        if line.strip():
+            self._error = line.strip()
+        stream.read_line_async(GLib.PRIORITY_LOW, self._cancellable, self._on_error_line)
+
+    def _on_progress_line(self, stream, result):
+        try:
+            line, _ = stream.read_line_finish_utf8(result)
+        except GLib.Error:
+            line = None
+        if line is None:
+            self._stream_closed()
+            return
+        key, _, value = line.partition("=")
+        if key == "out_time_us" and value.isdigit():
+            done = int(value) / 1_000_000
+            elapsed = time.monotonic() - self._started_at
+            length = max(self.end - self.snapped_start, 0.001)
+            self.fraction = min(done / length, 1.0)
+            self.speed = done / elapsed if elapsed > 0 else 0.0
+            self.emit("progress", self.fraction)
+        stream.read_line_async(GLib.PRIORITY_LOW, self._cancellable, self._on_progress_line)
+
+    def _on_copy_done(self, process, result):
+        try:
+            process.wait_finish(result)
+        except GLib.Error as e:
+            self._finish(False, e.message)
+            return
+        if process.get_if_exited() and process.get_exit_status() == 0:
+            try:
+                os.replace(self._partial, self.output)
+            except OSError as e:
+                self._finish(False, e.strerror)
+                return
+            self.fraction = 1.0
+            self._finish(True, self.output)
+            return
+        self._finish(False, self._error or "ffmpeg failed")
+
+    def _finish(self, ok, message):
+        self._process = None
+        if not ok:
+            for path in (self._partial, self.output):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+        self.emit("finished", ok, message)
@@ -0,0 +1,118 @@
+import logging
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+# Each level adds to the options of the levels before it, trading quality
+# for decode and render time. Level 0 is mpv's configuration as we found it.
+LEVELS = (
+    {},
+    {"framedrop": "decoder+vo"},
+    {"scale": "bilinear", "dscale": "bilinear", "cscale": "bilinear"},
+    {"vd-lavc-skiploopfilter": "nonref"},
+    {"vd-lavc-skiploopfilter": "all", "vd-lavc-fast": "yes"},
+)
+
+WINDOW = 5
+DROP_THRESHOLD = 3
+AVSYNC_THRESHOLD = 0.1
+HEADROOM_AVSYNC = 0.02
+# Frames mpv presented late (vo-delayed-frame-count) or at the wrong
+# vsync (mistimed-frame-count) within the window. mpv only counts these
+# with a display-sync video-sync mode; otherwise drops and A/V desync are
+# the signals.
+LATE_THRESHOLD = 5
+HEADROOM_SAMPLES = 15
+
+
+class QualityGovernor:
+    """Steps mpv quality settings down when playback falls behind.
+
+    ``sample`` is called once per interval. Dropped frames, A/V desync and
+    frames presented late are collected over a sliding window; once the
+    window is full and they pass the thresholds the governor moves one
+    level down. After a level change the window starts again empty, so
+    every decision sees ``WINDOW`` samples taken at the current level. It
+    only steps back up after ``HEADROOM_SAMPLES`` consecutive clean
+    samples, so it does not flap between levels.
+    """
+
+    def __init__(self, mpv_handle):
+        self._mpv = mpv_handle
+        self._window = deque(maxlen=WINDOW)
+        self._clean = 0
+        self._last_drops = None
+        self._last_late = None
+        self._baseline = {}
+        self.level = 0
+
+    def reset(self):
+        self._window.clear()
+        self._clean = 0
+        self._last_drops = None
+        self._last_late = None
+
+    def sample(self):
+        drops = (self._mpv.decoder_frame_drop_count or 0) + (self._mpv.frame_drop_count or 0)
+        avsync = abs(self._mpv.avsync or 0.0)
+        late = (self._mpv.vo_delayed_frame_count or 0) + (self._mpv.mistimed_frame_count or 0)
+        if (
+            self._last_drops is None
+            or drops < self._last_drops
+            or late < self._last_late
+        ):
+            # First sample, or the counters were reset by a new file.
+            self._last_drops = drops
+            self._last_late = late
+            return
+        delta = drops - self._last_drops
+        late_delta = late - self._last_late
+        self._last_drops = drops
+        self._last_late = late
+        self._window.append((delta, avsync, late_delta))
+        if len(self._window) < WINDOW:
+            return
+
+        stats = {
+            "drops": sum(d for d, _, _ in self._window),
+            "avsync": sum(a for _, a, _ in self._window) / len(self._window),
+            "late": sum(n for _, _, n in self._window),
+        }
+        if (
+            stats["drops"] >= DROP_THRESHOLD
+            or stats["avsync"] >= AVSYNC_THRESHOLD
+            or stats["late"] >= LATE_THRESHOLD
+        ):
+            if self.level < len(LEVELS) - 1:
+                self._set_level(self.level + 1, stats)
+            return
+
+        if delta == 0 and avsync <= HEADROOM_AVSYNC and late_delta == 0:
+            self._clean += 1
+        else:
+            self._clean = 0
+        if self._clean >= HEADROOM_SAMPLES and self.level > 0:
+            self._set_level(self.level - 1, stats)
+
+    def _options_for(self, level):
+        options = {}
+        for step in LEVELS[: level + 1]:
+            options.update(step)
+        return options
+
+    def _set_level(self, level, stats):
+        old = self._options_for(self.level)
+        new = self._options_for(level)
+        for name, value in new.items():
+            if old.get(name) != value:
+                self._baseline.setdefault(name, self._mpv[name])
+                self._mpv[name] = value
+        for name in old.keys() - new.keys():
+            self._mpv[name] = self._baseline[name]
+        log.info(
+            "quality level %d -> %d (drops=%d, late=%d in %d samples, avsync=%.3f): %s",
+            self.level, level, stats["drops"], stats["late"], len(self._window),
+            stats["avsync"], new or "defaults",
+        )
+        self.level = level
+        self.reset()
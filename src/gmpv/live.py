@@ -0,0 +1,68 @@
+from urllib.parse import urlsplit
+
+LIVE_SCHEMES = ("udp", "rtp", "rtsp", "rtsps", "srt")
+
+# Demuxer buffer cap for live streams. It has to hold more than
+# DROP_LATENCY of media at camera bitrates (8 MiB is ~8 s at 8 Mbit/s),
+# otherwise the excess waits in the socket buffer where
+# demuxer-cache-duration cannot see it and the catch-up never triggers.
+LIVE_BUFFER_BYTES = "8MiB"
+
+# Per-file mpv options applied when a live stream is loaded. They replace
+# the readahead/caching defaults that suit files but add seconds of delay
+# to a live feed.
+LIVE_OPTIONS = {
+    "cache": "no",
+    "cache_pause": "no",
+    "demuxer_readahead_secs": 0,
+    "demuxer_max_bytes": LIVE_BUFFER_BYTES,
+    "demuxer_max_back_bytes": 0,
+    "demuxer_lavf_o": "fflags=+nobuffer",
+    "demuxer_lavf_analyzeduration": 0.1,
+    "demuxer_lavf_probe_info": "nostreams",
+    "stream_buffer_size": "4KiB",
+    "vd_lavc_threads": 1,
+    "video_sync": "audio",
+    "interpolation": "no",
+    "untimed": "yes",
+    "rtsp_transport": "udp",
+}
+
+# Buffered seconds the catch-up logic aims for, and the points at which it
+# speeds playback up or drops the buffers to return to the live edge.
+TARGET_LATENCY = 0.2
+SPEEDUP_LATENCY = 0.5
+DROP_LATENCY = 2.0
+CATCHUP_SPEED = 1.1
+
+
+def is_live_url(path):
+    return urlsplit(path).scheme.lower() in LIVE_SCHEMES
+
+
+class LiveCatchup:
+    """Decides how to react to the amount of buffered-but-unplayed media.
+
+    ``update`` returns a ``(speed, drop)`` pair: the playback speed to use
+    and whether to run mpv's ``drop-buffers`` command. Live streams have no
+    seekable cache, so dropping what is buffered is the only way to get
+    back to the live edge in one step.
+    """
+
+    def __init__(self, target=TARGET_LATENCY, speedup=SPEEDUP_LATENCY, drop=DROP_LATENCY):
+        self.target = target
+        self.speedup = speedup
+        self.drop = drop
+        self.latency = 0.0
+        self._catching_up = False
+
+    def update(self, buffered):
+        self.latency = buffered
+        if buffered >= self.drop:
+            self._catching_up = False
+            return 1.0, True
+        if buffered >= self.speedup:
+            self._catching_up = True
+        elif buffered <= self.target:
+            self._catching_up = False
+        return (CATCHUP_SPEED if self._catching_up else 1.0), False
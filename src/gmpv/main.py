@@ -1,3 +1,5 @@
+import logging
+import os
 import sys
 
 import gi
@@ -26,7 +28,7 @@ class GmpvApplication(Adw.Application):
         self.do_activate()
         win = self.props.active_window
         if files:
-            win.open_file(files[0].get_path())
+            win.open_file(files[0].get_path() or files[0].get_uri())
 
     def do_startup(self):
         Adw.Application.do_startup(self)
@@ -43,6 +45,8 @@ class GmpvApplication(Adw.Application):
         self.add_action(quit_action)
         self.set_accels_for_action("app.quit", ["q"])
 
+        self.set_accels_for_action("win.export-segment", ["<Control>e"])
+
         about_action = Gio.SimpleAction.new("about", None)
         about_action.connect("activate", self._on_about)
         self.add_action(about_action)
@@ -70,6 +74,10 @@ class GmpvApplication(Adw.Application):
 
 
 def main():
+    logging.basicConfig(
+        level=logging.DEBUG if os.environ.get("GMPV_DEBUG") else logging.WARNING,
+        format="%(name)s: %(message)s",
+    )
     app = GmpvApplication()
     return app.run(sys.argv)
 
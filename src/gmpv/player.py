@@ -1,3 +1,10 @@
+import logging
+import os
+import statistics
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
 import mpv
 
 import gi
@@ -6,6 +13,35 @@ gi.require_version("Gtk", "4.0")
 gi.require_version("Gdk", "4.0")
 from gi.repository import GLib, GObject, Gdk, Gtk
 
+from gmpv.governor import QualityGovernor
+from gmpv.live import LIVE_OPTIONS, LiveCatchup, is_live_url
+from gmpv.sidecar import SidecarFinder
+from gmpv.storage import SLOW_STORAGE_OPTIONS, cache_dir, is_slow_storage
+from gmpv.views import SharedFrame
+
+log = logging.getLogger(__name__)
+
+_LIVE_POLL_MS = 250
+_GOVERNOR_INTERVAL_S = 1
+
+SPEED_STEPS = (0.25, 0.5, 1.0, 1.5, 2.0, 4.0, 8.0, 16.0, 32.0)
+# At and above this speed only keyframes are decoded and audio is muted.
+TRICK_PLAY_SPEED = 4.0
+
+# Backward decoding keeps the frames of whole GOPs in mpv's reversal
+# buffer, so repeated back-steps are served from memory. These bound how
+# many GOPs are decoded per batch and how much memory they may use.
+_BACKWARD_OPTIONS = {
+    "video-backward-batch": 2,
+    "video-backward-overlap": "auto",
+    "video-reversal-buffer": "512MiB",
+    "demuxer-backward-playback-step": 30,
+}
+_STEP_LATENCY_SAMPLES = 20
+# A step that has not moved the playhead by then (e.g. a back-step at the
+# start of the file) is forgotten rather than timed against a later update.
+_STEP_TIMEOUT_S = 2.0
+
 
 def _get_display_backend():
     display = Gdk.Display.get_default()
@@ -17,6 +53,10 @@ def _get_display_backend():
     return "unknown"
 
 
+def _format_cost(cost):
+    return f"{cost.cpu * 1000:.2f} ms cpu, {cost.gpu * 1000:.2f} ms gpu"
+
+
 class Player(GObject.Object):
     __gsignals__ = {
         "position-changed": (GObject.SignalFlags.RUN_LAST, None, (float,)),
@@ -27,6 +67,8 @@ class Player(GObject.Object):
         "file-loaded": (GObject.SignalFlags.RUN_LAST, None, ()),
         "end-file": (GObject.SignalFlags.RUN_LAST, None, (str,)),
         "eof": (GObject.SignalFlags.RUN_LAST, None, ()),
+        "speed-changed": (GObject.SignalFlags.RUN_LAST, None, (float,)),
+        "display-fps-changed": (GObject.SignalFlags.RUN_LAST, None, (float,)),
     }
 
     def __init__(self):
@@ -39,6 +81,29 @@ class Player(GObject.Object):
         self.paused = True
         self.volume = 100.0
         self.tracks = []
+        self.speed = 1.0
+        self._vf_fps = 0.0
+        self.trick_play = False
+        self._trick_muted = False
+        self.reverse = False
+        self._direction = "+"
+        self._step_started = None
+        self._step_latencies = deque(maxlen=_STEP_LATENCY_SAMPLES)
+        self.slow_storage = False
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._views = []
+        self.shared_frame = SharedFrame()
+        self._tracks_by_type = {}
+        self._sidecar_finder = SidecarFinder()
+        self._sidecars = None
+        self._sidecar_path = None
+        self._loaded_path = None
+        self.live = False
+        self._live_catchup = LiveCatchup()
+        self._live_poll_id = None
+        self._governor = None
+        self._governor_id = None
 
     @property
     def backend(self):
@@ -52,6 +117,8 @@ class Player(GObject.Object):
             osc=False,
             osd_level=0,
             keep_open="yes",
+            sub_auto="no",
+            audio_file_auto="no",
         )
         self._observe_properties()
 
@@ -64,6 +131,8 @@ class Player(GObject.Object):
             osc=False,
             osd_level=0,
             keep_open="yes",
+            sub_auto="no",
+            audio_file_auto="no",
             vo="libmpv",
         )
         self._gl_area = gl_area
@@ -94,7 +163,13 @@ class Player(GObject.Object):
 
     def _on_mpv_render_update(self):
         if hasattr(self, "_gl_area"):
-            GLib.idle_add(self._gl_area.queue_render)
+            GLib.idle_add(self._on_new_frame)
+
+    def _on_new_frame(self):
+        self._gl_area.queue_render()
+        if self._views:
+            self._render_shared_frame()
+        return False
 
     def render_gl(self, fbo, width, height):
         if self._render_ctx:
@@ -103,24 +178,105 @@ class Player(GObject.Object):
                 opengl_fbo={"fbo": fbo, "w": width, "h": height},
             )
 
+    def _render_shared_frame(self):
+        # mpv's GL objects live in the main GLArea's context, so the shared
+        # frame is rendered there as well, just outside its render signal.
+        # That keeps the other views going while the main window is hidden.
+        width = max(view.get_width() * view.get_scale_factor() for view in self._views)
+        height = max(view.get_height() * view.get_scale_factor() for view in self._views)
+        if not self._render_ctx or not width or not height or not self._gl_area.get_realized():
+            return
+        self._gl_area.make_current()
+        fbo = self.shared_frame.begin(width, height)
+        self._render_ctx.render(
+            flip_y=True,
+            opengl_fbo={"fbo": fbo, "w": width, "h": height},
+        )
+        self.shared_frame.publish()
+        for view in self._views:
+            view.queue_render()
+
+    def add_view(self, view):
+        """Present the video in another GLArea as well (see gmpv.views).
+
+        Only works with the libmpv render API, i.e. after setup_wayland.
+        While views are attached mpv renders each frame a second time, at
+        the size of the largest view, into ``shared_frame``.
+        """
+        if view not in self._views:
+            self._views.append(view)
+        if hasattr(self, "_gl_area"):
+            GLib.idle_add(self._on_new_frame)
+
+    def remove_view(self, view):
+        if view in self._views:
+            self._views.remove(view)
+        if not self._views and hasattr(self, "_gl_area") and self._gl_area.get_realized():
+            self._gl_area.make_current()
+            self.shared_frame.free()
+
     def _observe_properties(self):
         self._mpv.observe_property("time-pos", self._on_time_pos)
         self._mpv.observe_property("duration", self._on_duration)
         self._mpv.observe_property("pause", self._on_pause)
         self._mpv.observe_property("volume", self._on_volume)
         self._mpv.observe_property("track-list", self._on_track_list)
+        self._mpv.observe_property("speed", self._on_speed)
+        self._mpv.observe_property("estimated-vf-fps", self._on_vf_fps)
+
+        self._governor = QualityGovernor(self._mpv)
+        self._governor_id = GLib.timeout_add_seconds(_GOVERNOR_INTERVAL_S, self._on_governor_tick)
 
         @self._mpv.event_callback("file-loaded")
         def on_file_loaded(event):
-            GLib.idle_add(self.emit, "file-loaded")
+            GLib.idle_add(self._on_file_loaded, self._mpv.path)
 
         @self._mpv.event_callback("end-file")
         def on_end_file(event):
             reason = event.get("reason", "unknown") if isinstance(event, dict) else "unknown"
             GLib.idle_add(self.emit, "end-file", str(reason))
 
+    def _on_file_loaded(self, path):
+        self._loaded_path = path
+        self._governor.reset()
+        self._attach_sidecars()
+        self.emit("file-loaded")
+        return False
+
+    def _on_sidecars_found(self, path, subs, audio):
+        if path != self._sidecar_path:
+            return
+        self._sidecars = (subs, audio)
+        self._attach_sidecars()
+
+    def _attach_sidecars(self):
+        if not self._mpv or not self._sidecars or self._loaded_path != self._sidecar_path:
+            return
+        subs, audio = self._sidecars
+        self._sidecars = None
+        # Track selection ran at load time, before these were added, so the
+        # "auto" flag would never pick them. Select the first one when no
+        # subtitle is on, as mpv's own sub-auto=exact scan used to.
+        select_sub = self._mpv.sid in (None, False, "no")
+        # Async, opening the files can take a while on a slow mount.
+        for sub in subs:
+            self._mpv.command_async("sub-add", sub, "select" if select_sub else "auto")
+            select_sub = False
+        for track in audio:
+            self._mpv.command_async("audio-add", track, "auto")
+
+    def _on_governor_tick(self):
+        if not self._mpv:
+            self._governor_id = None
+            return False
+        if not self.paused and not self.live and not self.trick_play:
+            self._governor.sample()
+        return True
+
     def _on_time_pos(self, name, value):
         if value is not None:
+            if self._step_started is not None:
+                self._record_step_latency()
             self.position = value
             GLib.idle_add(self.emit, "position-changed", value)
 
@@ -141,25 +297,217 @@ class Player(GObject.Object):
 
     def _on_track_list(self, name, value):
         if value is not None:
+            by_type = {}
+            for track in value:
+                by_type.setdefault(track.get("type"), []).append(track)
             self.tracks = value
+            self._tracks_by_type = by_type
             GLib.idle_add(self.emit, "track-list-changed")
 
+    def _on_speed(self, name, value):
+        if value is not None:
+            self.speed = value
+            GLib.idle_add(self.emit, "speed-changed", value)
+
+    def _on_vf_fps(self, name, value):
+        if value is not None:
+            self._vf_fps = value
+            GLib.idle_add(self.emit, "display-fps-changed", self.display_fps)
+
+    @property
+    def display_fps(self):
+        """Frames shown per wall-clock second.
+
+        estimated-vf-fps is measured in media time, so it is scaled by the
+        current speed. It stays constant across speeds in keyframe-only
+        mode with a fixed GOP, which is why the product is not cached.
+        """
+        return self._vf_fps * self.speed
+
     def loadfile(self, path):
-        if self._mpv:
+        if not self._mpv:
+            return
+        self._stop_live_poll()
+        self._sidecar_finder.cancel()
+        self._sidecars = None
+        self._sidecar_path = None
+        # Until file-loaded arrives, mpv still has the previous file (maybe
+        # the same path) and sidecars must not be attached to it.
+        self._loaded_path = None
+        self._set_trick_play(False, resync=False)
+        self._mpv.speed = 1.0
+        self.reverse = False
+        self._set_direction("+")
+        self._step_started = None
+        self._cache_hits = 0
+        self._cache_misses = 0
+        if not urlsplit(path).scheme:
+            path = os.path.abspath(path)
+        self.live = is_live_url(path)
+        self.slow_storage = not self.live and os.path.isabs(path) and is_slow_storage(path)
+        if self.live:
+            self._mpv.loadfile(path, **LIVE_OPTIONS)
+            self._live_poll_id = GLib.timeout_add(_LIVE_POLL_MS, self._on_live_poll)
+        elif self.slow_storage:
+            directory = cache_dir()
+            os.makedirs(directory, exist_ok=True)
+            self._mpv["demuxer-cache-dir"] = directory
+            self._mpv.loadfile(path, **SLOW_STORAGE_OPTIONS)
+        else:
             self._mpv.loadfile(path)
+        if not self.live and os.path.isabs(path):
+            self._sidecar_path = path
+            self._sidecar_finder.find(path, lambda subs, audio: self._on_sidecars_found(path, subs, audio))
+
+    @property
+    def path(self):
+        """Path or URL of the loaded file, or None."""
+        return self._loaded_path
+
+    @property
+    def latency(self):
+        """Seconds of live media buffered ahead of the playhead."""
+        return self._live_catchup.latency
+
+    def _on_live_poll(self):
+        if not self._mpv or not self.live:
+            self._live_poll_id = None
+            return False
+        buffered = self._mpv.demuxer_cache_duration
+        if buffered is None:
+            return True
+        speed, drop = self._live_catchup.update(buffered)
+        if drop:
+            self._mpv.command("drop-buffers")
+        if self._mpv.speed != speed:
+            self._mpv.speed = speed
+        return True
+
+    def _stop_live_poll(self):
+        if self._live_poll_id:
+            GLib.source_remove(self._live_poll_id)
+            self._live_poll_id = None
 
     def play_pause(self):
         if self._mpv:
+            # A back-step leaves mpv decoding backward. Only switch to the
+            # direction the user asked for when resuming, so pausing keeps
+            # the reversal buffer for further back-steps.
+            if self.paused:
+                self._set_direction("-" if self.reverse else "+")
             self._mpv.cycle("pause")
 
+    def frame_step(self):
+        """Step one frame forward.
+
+        mpv can only decode forward in play-dir=+, so stepping forward after
+        back-steps switches direction and drops the reversal buffer.
+        """
+        if self._mpv:
+            self._set_direction("+")
+            self._step_started = time.perf_counter()
+            self._mpv.frame_step()
+
+    def frame_back_step(self):
+        """Step one frame back using backward decoding.
+
+        The first back-step switches mpv to backward playback, which decodes
+        a batch of GOPs into the reversal buffer. Further back-steps are
+        served from that buffer until it runs out.
+        """
+        if self._mpv:
+            self._set_direction("-")
+            self._step_started = time.perf_counter()
+            # With play-dir=- frame-step moves backward.
+            self._mpv.frame_step()
+
+    def toggle_reverse(self):
+        if self._mpv:
+            self.reverse = not self.reverse
+            self._set_direction("-" if self.reverse else "+")
+
+    @property
+    def step_latency(self):
+        """Median seconds between a frame step and the new frame, or None."""
+        if not self._step_latencies:
+            return None
+        return statistics.median(self._step_latencies)
+
+    def _set_direction(self, direction):
+        if direction == self._direction:
+            return
+        if direction == "-":
+            for name, value in _BACKWARD_OPTIONS.items():
+                self._mpv[name] = value
+        self._direction = direction
+        self._mpv.play_dir = direction
+
+    def _record_step_latency(self):
+        latency = time.perf_counter() - self._step_started
+        self._step_started = None
+        if latency > _STEP_TIMEOUT_S:
+            return
+        self._step_latencies.append(latency)
+        log.debug(
+            "frame step (%s) took %.1f ms, median of last %d: %.1f ms",
+            "back" if self._direction == "-" else "forward",
+            latency * 1000, len(self._step_latencies), self.step_latency * 1000,
+        )
+
     def seek(self, seconds, reference="relative"):
         if self._mpv:
+            self._step_started = None
+            if self.slow_storage:
+                if reference == "relative":
+                    self._count_cache_hit(self.position + seconds)
+                elif reference == "absolute":
+                    self._count_cache_hit(seconds)
             self._mpv.seek(seconds, reference)
 
     def seek_absolute(self, position):
         if self._mpv:
+            self._step_started = None
+            if self.slow_storage:
+                self._count_cache_hit(position)
             self._mpv.seek(position, "absolute")
 
+    def _count_cache_hit(self, target):
+        state = self._mpv.demuxer_cache_state or {}
+        for r in state.get("seekable-ranges", []):
+            if r.get("start", 0) <= target <= r.get("end", 0):
+                self._cache_hits += 1
+                return
+        self._cache_misses += 1
+
+    def get_stats(self):
+        """Return ``(label, value)`` pairs describing playback, for display."""
+        if not self._mpv:
+            return []
+        drops = (self._mpv.decoder_frame_drop_count or 0) + (self._mpv.frame_drop_count or 0)
+        stats = [
+            ("speed", f"{self.speed:g}×" + (f" ({self.display_fps:.0f} fps shown)" if self.trick_play else "")),
+            ("dropped frames", str(drops)),
+            ("quality level", f"{self._governor.level}" if self._governor else "-"),
+        ]
+        if self.live:
+            stats.append(("live latency", f"{self.latency * 1000:.0f} ms"))
+        if self.step_latency is not None:
+            stats.append(("frame step", f"{self.step_latency * 1000:.0f} ms"))
+
+        state = self._mpv.demuxer_cache_state or {}
+        seeks = self._cache_hits + self._cache_misses
+        stats += [
+            ("storage", "slow, disk cache" if self.slow_storage else "local"),
+            ("cache hit rate", f"{self._cache_hits / seeks:.0%} of {seeks} seeks" if seeks else "-"),
+            ("read rate", f"{state.get('raw-input-rate', 0) / 1024 ** 2:.1f} MiB/s"),
+            ("cached ahead", f"{state.get('cache-duration', 0):.1f} s"),
+        ]
+        if self._views:
+            stats.append((self.shared_frame.cost.label, _format_cost(self.shared_frame.cost)))
+            for view in self._views:
+                stats.append((view.cost.label, _format_cost(view.cost)))
+        return stats
+
     def set_volume(self, volume):
         if self._mpv:
             self._mpv.volume = volume
@@ -173,11 +521,49 @@ class Player(GObject.Object):
         if self._mpv:
             setattr(self._mpv, track_type, track_id)
 
+    def set_speed(self, speed):
+        # Live streams run at the speed LiveCatchup picks.
+        if not self._mpv or self.live:
+            return
+        speed = min(max(speed, SPEED_STEPS[0]), SPEED_STEPS[-1])
+        self._set_trick_play(speed >= TRICK_PLAY_SPEED)
+        self._mpv.speed = speed
+
+    def speed_up(self):
+        self.set_speed(next((s for s in SPEED_STEPS if s > self.speed), SPEED_STEPS[-1]))
+
+    def slow_down(self):
+        self.set_speed(next((s for s in reversed(SPEED_STEPS) if s < self.speed), SPEED_STEPS[0]))
+
+    def _set_trick_play(self, enabled, resync=True):
+        if enabled == self.trick_play:
+            return
+        self.trick_play = enabled
+        # The old estimate describes the other decoding mode; wait for a new one.
+        self._vf_fps = 0.0
+        if enabled:
+            self._trick_muted = not self._mpv.mute
+            self._mpv["vd-lavc-skipframe"] = "nonkey"
+            self._mpv.mute = True
+        else:
+            self._mpv["vd-lavc-skipframe"] = "default"
+            if self._trick_muted:
+                self._mpv.mute = False
+            if resync:
+                # Resync so decoding continues from the current position with
+                # every frame instead of waiting for the next keyframe.
+                self._mpv.seek(0, "relative", "exact")
+
     def get_tracks_by_type(self, track_type):
         """Return tracks filtered by type ('audio', 'video', 'sub')."""
-        return [t for t in self.tracks if t.get("type") == track_type]
+        return self._tracks_by_type.get(track_type, [])
 
     def shutdown(self):
+        self._stop_live_poll()
+        self._sidecar_finder.cancel()
+        if self._governor_id:
+            GLib.source_remove(self._governor_id)
+            self._governor_id = None
         if hasattr(self, "_render_ctx") and self._render_ctx:
             self._render_ctx.free()
             self._render_ctx = None
@@ -0,0 +1,258 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import threading
+
+from gi.repository import GLib
+
+log = logging.getLogger(__name__)
+
+SOCKET_NAME = "gmpv.sock"
+# Default and minimum seconds between two notification batches to a client.
+NOTIFY_INTERVAL = 0.1
+
+# Player signal -> (notification name, Player attribute holding the value)
+_SIGNAL_PROPERTIES = {
+    "position-changed": ("position", "position"),
+    "duration-changed": ("duration", "duration"),
+    "pause-changed": ("paused", "paused"),
+    "volume-changed": ("volume", "volume"),
+    "track-list-changed": ("tracks", "tracks"),
+    "file-loaded": ("file-loaded", None),
+    "end-file": ("end-file", None),
+}
+
+_PROPERTIES = ("position", "duration", "paused", "volume", "tracks", "live")
+
+_PARSE_ERROR = -32700
+_INVALID_REQUEST = -32600
+_METHOD_NOT_FOUND = -32601
+_INVALID_PARAMS = -32602
+_SERVER_ERROR = -32000
+
+
+def default_socket_path():
+    return os.path.join(GLib.get_user_runtime_dir(), SOCKET_NAME)
+
+
+class _RpcError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+class _Client:
+    """One connection. Pending notifications are kept as a name -> value
+    dict, so a subscriber that reads slowly only ever sees the latest value
+    of each property instead of a growing backlog."""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.subscriptions = set()
+        self.interval = NOTIFY_INTERVAL
+        self.pending = {}
+        self.wakeup = asyncio.Event()
+
+    def publish(self, name, value):
+        if name in self.subscriptions:
+            self.pending[name] = value
+            self.wakeup.set()
+
+    async def send(self, message):
+        self.writer.write(json.dumps(message).encode() + b"\n")
+        await self.writer.drain()
+
+    async def notify_loop(self):
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            batch, self.pending = self.pending, {}
+            await self.send([
+                {"jsonrpc": "2.0", "method": "property-changed",
+                 "params": {"name": name, "value": value}}
+                for name, value in batch.items()
+            ])
+            await asyncio.sleep(self.interval)
+
+
+class RpcServer:
+    """JSON-RPC 2.0 server on a Unix socket for controlling a Player.
+
+    Requests and responses are newline-delimited JSON. The server runs its
+    own asyncio loop on a background thread; player commands are handed to
+    the GLib main loop with ``GLib.idle_add`` and property changes come
+    back through ``call_soon_threadsafe``, so neither loop waits on the
+    other.
+    """
+
+    def __init__(self, player, path=None):
+        self._player = player
+        self._path = path or default_socket_path()
+        self._loop = None
+        self._thread = None
+        self._server = None
+        self._clients = set()
+        self._handler_ids = []
+
+    @property
+    def path(self):
+        return self._path
+
+    def start(self):
+        self._loop = asyncio.new_event_loop()
+        started = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, args=(started,), name="gmpv-rpc", daemon=True,
+        )
+        self._thread.start()
+        started.wait()
+        if self._server is None:
+            raise OSError(f"could not listen on {self._path}")
+        for signal in _SIGNAL_PROPERTIES:
+            self._handler_ids.append(self._player.connect(signal, self._on_player_signal, signal))
+
+    def stop(self):
+        for handler_id in self._handler_ids:
+            self._player.disconnect(handler_id)
+        self._handler_ids = []
+        if self._loop and self._thread:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+        self._thread = None
+        if os.path.exists(self._path):
+            os.unlink(self._path)
+
+    def _run(self, started):
+        asyncio.set_event_loop(self._loop)
+        try:
+            if os.path.exists(self._path):
+                os.unlink(self._path)
+            self._server = self._loop.run_until_complete(
+                asyncio.start_unix_server(self._on_connect, path=self._path)
+            )
+            os.chmod(self._path, 0o600)
+        except OSError as e:
+            log.warning("rpc: %s", e)
+            self._loop.close()
+            started.set()
+            return
+        log.info("rpc: listening on %s", self._path)
+        started.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._server.close()
+            for client in list(self._clients):
+                client.writer.close()
+            self._loop.close()
+
+    def _on_player_signal(self, player, *args):
+        if not self._clients:
+            return
+        signal = args[-1]
+        name, attr = _SIGNAL_PROPERTIES[signal]
+        value = getattr(player, attr) if attr else (args[0] if len(args) > 1 else True)
+        self._loop.call_soon_threadsafe(self._publish, name, value)
+
+    def _publish(self, name, value):
+        for client in self._clients:
+            client.publish(name, value)
+
+    async def _on_connect(self, reader, writer):
+        client = _Client(writer)
+        self._clients.add(client)
+        notifier = asyncio.create_task(client.notify_loop())
+        try:
+            while line := await reader.readline():
+                response = await self._handle_line(client, line)
+                if response is not None:
+                    await client.send(response)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            notifier.cancel()
+            self._clients.discard(client)
+            writer.close()
+
+    async def _handle_line(self, client, line):
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return _error(None, _PARSE_ERROR, "parse error")
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            return _error(None, _INVALID_REQUEST, "invalid request")
+
+        request_id = request.get("id")
+        params = request.get("params", [])
+        try:
+            result = await self._dispatch(client, request["method"], params)
+        except _RpcError as e:
+            return _error(request_id, e.code, str(e))
+        except Exception as e:
+            log.exception("rpc: %s failed", request["method"])
+            return _error(request_id, _SERVER_ERROR, str(e))
+        if request_id is None:
+            return None
+        return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+    async def _dispatch(self, client, method, params):
+        args, kwargs = (params, {}) if isinstance(params, list) else ([], params)
+        match method:
+            case "loadfile" | "seek" | "set_track" | "set_volume" | "play_pause" | "toggle_mute":
+                try:
+                    return await self._call_in_main(getattr(self._player, method), *args, **kwargs)
+                except TypeError as e:
+                    raise _RpcError(_INVALID_PARAMS, str(e))
+            case "get_property":
+                name = (args or [kwargs.get("name")])[0]
+                if name not in _PROPERTIES:
+                    raise _RpcError(_INVALID_PARAMS, f"unknown property: {name}")
+                return getattr(self._player, name)
+            case "subscribe":
+                names = set(args or kwargs.get("names", []))
+                unknown = names - {name for name, _ in _SIGNAL_PROPERTIES.values()}
+                if unknown:
+                    raise _RpcError(_INVALID_PARAMS, f"unknown property: {', '.join(sorted(unknown))}")
+                try:
+                    interval = float(kwargs.get("interval", client.interval))
+                except (TypeError, ValueError):
+                    raise _RpcError(_INVALID_PARAMS, "interval must be a number")
+                if not math.isfinite(interval):
+                    raise _RpcError(_INVALID_PARAMS, "interval must be a number")
+                client.subscriptions |= names
+                client.interval = max(interval, NOTIFY_INTERVAL)
+                return sorted(client.subscriptions)
+            case "unsubscribe":
+                client.subscriptions -= set(args or kwargs.get("names", []))
+                return sorted(client.subscriptions)
+        raise _RpcError(_METHOD_NOT_FOUND, f"unknown method: {method}")
+
+    def _call_in_main(self, func, *args, **kwargs):
+        loop = self._loop
+        future = loop.create_future()
+
+        def resolve(result, error):
+            if future.done():
+                return
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+        def run():
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                loop.call_soon_threadsafe(resolve, None, e)
+            else:
+                loop.call_soon_threadsafe(resolve, result, None)
+            return False
+
+        GLib.idle_add(run)
+        return future
+
+
+def _error(request_id, code, message):
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
@@ -0,0 +1,114 @@
+import os
+
+from gi.repository import Gio, GLib
+
+SUB_EXTENSIONS = frozenset({".srt", ".ass", ".ssa", ".vtt", ".sub", ".sup", ".smi", ".lrc"})
+AUDIO_EXTENSIONS = frozenset({
+    ".mka", ".aac", ".ac3", ".eac3", ".dts", ".flac", ".m4a", ".mp3", ".opus", ".ogg", ".wav",
+})
+
+_ENUMERATE_BATCH = 256
+
+
+def match_sidecars(media_path, names):
+    """Split ``names`` into subtitle and audio files belonging to ``media_path``.
+
+    A sidecar shares the media file's stem, optionally followed by more
+    dot-separated parts such as a language code (``movie.en.srt``).
+    """
+    media_name = os.path.basename(media_path)
+    stem = os.path.splitext(media_name)[0]
+    subs, audio = [], []
+    for name in sorted(names):
+        if name == media_name:
+            continue
+        base, ext = os.path.splitext(name)
+        if base != stem and not base.startswith(stem + "."):
+            continue
+        ext = ext.lower()
+        if ext in SUB_EXTENSIONS:
+            subs.append(os.path.join(os.path.dirname(media_path), name))
+        elif ext in AUDIO_EXTENSIONS:
+            audio.append(os.path.join(os.path.dirname(media_path), name))
+    return subs, audio
+
+
+class SidecarFinder:
+    """Finds external subtitle and audio files next to a media file.
+
+    Directory listings are read with Gio's async API and cached by the
+    directory's modification time, so opening several files from the same
+    folder only lists it once.
+    """
+
+    def __init__(self):
+        self._listings = {}
+        self._cancellable = None
+
+    def find(self, media_path, callback):
+        """Call ``callback(subs, audio)`` from the main loop once done."""
+        if self._cancellable:
+            self._cancellable.cancel()
+        self._cancellable = Gio.Cancellable()
+        directory = Gio.File.new_for_path(os.path.dirname(media_path) or ".")
+        directory.query_info_async(
+            "time::modified,time::modified-usec",
+            Gio.FileQueryInfoFlags.NONE,
+            GLib.PRIORITY_LOW,
+            self._cancellable,
+            self._on_dir_info,
+            (media_path, callback, self._cancellable),
+        )
+
+    def cancel(self):
+        if self._cancellable:
+            self._cancellable.cancel()
+            self._cancellable = None
+
+    def _on_dir_info(self, directory, result, data):
+        media_path, callback, cancellable = data
+        try:
+            info = directory.query_info_finish(result)
+        except GLib.Error:
+            return
+        mtime = (
+            info.get_attribute_uint64("time::modified"),
+            info.get_attribute_uint32("time::modified-usec"),
+        )
+        cached = self._listings.get(directory.get_path())
+        if cached and cached[0] == mtime:
+            callback(*match_sidecars(media_path, cached[1]))
+            return
+        directory.enumerate_children_async(
+            "standard::name",
+            Gio.FileQueryInfoFlags.NONE,
+            GLib.PRIORITY_LOW,
+            cancellable,
+            self._on_enumerate,
+            (media_path, callback, cancellable, mtime, []),
+        )
+
+    def _on_enumerate(self, directory, result, data):
+        try:
+            enumerator = directory.enumerate_children_finish(result)
+        except GLib.Error:
+            return
+        enumerator.next_files_async(
+            _ENUMERATE_BATCH, GLib.PRIORITY_LOW, data[2], self._on_next_files, (directory, data),
+        )
+
+    def _on_next_files(self, enumerator, result, data):
+        directory, (media_path, callback, cancellable, mtime, names) = data
+        try:
+            infos = enumerator.next_files_finish(result)
+        except GLib.Error:
+            return
+        if infos:
+            names.extend(info.get_name() for info in infos)
+            enumerator.next_files_async(
+                _ENUMERATE_BATCH, GLib.PRIORITY_LOW, cancellable, self._on_next_files, data,
+            )
+            return
+        enumerator.close_async(GLib.PRIORITY_LOW, None, None)
+        self._listings[directory.get_path()] = (mtime, names)
+        callback(*match_sidecars(media_path, names))
@@ -0,0 +1,66 @@
+import os
+
+from gi.repository import GLib
+
+NETWORK_FILESYSTEMS = frozenset({
+    "nfs", "nfs4", "cifs", "smb3", "smbfs", "9p", "afs", "ceph", "glusterfs",
+    "fuse.sshfs", "fuse.rclone", "fuse.gvfsd-fuse", "davfs", "fuse.davfs2",
+})
+
+# Per-file mpv options for media on slow storage: cache to disk instead of
+# RAM, read far ahead of the playhead, and keep what was already played so
+# seeking back does not go to the slow mount again. The cache file holds at
+# most demuxer_max_bytes + demuxer_max_back_bytes. mpv unlinks it right
+# after creating it, so its space is freed when the file is closed and
+# nothing is left behind in the directory even if gmpv crashes.
+SLOW_STORAGE_OPTIONS = {
+    "cache": "yes",
+    "cache_on_disk": "yes",
+    "demuxer_cache_unlink_files": "immediate",
+    "cache_secs": 120,
+    "demuxer_readahead_secs": 120,
+    "demuxer_max_bytes": "1GiB",
+    "demuxer_max_back_bytes": "1GiB",
+    "demuxer_seekable_cache": "yes",
+}
+
+
+def cache_dir():
+    return os.path.join(GLib.get_user_cache_dir(), "gmpv", "demux")
+
+
+def _mount_for(path):
+    """Return ``(fstype, source)`` of the mount containing ``path``."""
+    best, result = "", (None, None)
+    try:
+        with open("/proc/self/mountinfo") as f:
+            for line in f:
+                fields = line.split()
+                # Optional fields end with "-", followed by fstype and source.
+                sep = fields.index("-")
+                mount_point = fields[4].replace("\\040", " ")
+                if mount_point == "/" or path == mount_point or path.startswith(mount_point + "/"):
+                    if len(mount_point) > len(best):
+                        best, result = mount_point, (fields[sep + 1], fields[sep + 2])
+    except (OSError, ValueError, IndexError):
+        pass
+    return result
+
+
+def _is_usb_device(source):
+    if not source or not source.startswith("/dev/"):
+        return False
+    name = os.path.basename(os.path.realpath(source))
+    # /sys/class/block/<dev> links into the device tree, which names the bus.
+    return "/usb" in os.path.realpath(os.path.join("/sys/class/block", name))
+
+
+def is_slow_storage(path):
+    """Whether ``path`` is on a network filesystem or a USB disk.
+
+    Only reads /proc and /sys, never the media path itself, so it cannot
+    stall on an unresponsive mount.
+    """
+    fstype, source = _mount_for(os.path.abspath(path))
+    return fstype in NETWORK_FILESYSTEMS or _is_usb_device(source)
+
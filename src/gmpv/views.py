@@ -0,0 +1,341 @@
+import ctypes
+import logging
+import time
+
+import gi
+
+gi.require_version("Gtk", "4.0")
+from gi.repository import Gtk
+
+log = logging.getLogger(__name__)
+
+_GL_TEXTURE_2D = 0x0DE1
+_GL_RGBA = 0x1908
+_GL_RGBA8 = 0x8058
+_GL_UNSIGNED_BYTE = 0x1401
+_GL_TEXTURE_MIN_FILTER = 0x2801
+_GL_TEXTURE_MAG_FILTER = 0x2800
+_GL_LINEAR = 0x2601
+_GL_FRAMEBUFFER = 0x8D40
+_GL_READ_FRAMEBUFFER = 0x8CA8
+_GL_DRAW_FRAMEBUFFER = 0x8CA9
+_GL_DRAW_FRAMEBUFFER_BINDING = 0x8CA6
+_GL_COLOR_ATTACHMENT0 = 0x8CE0
+_GL_COLOR_BUFFER_BIT = 0x4000
+_GL_TIME_ELAPSED = 0x88BF
+_GL_QUERY_RESULT = 0x8866
+_GL_QUERY_RESULT_AVAILABLE = 0x8867
+_GL_SYNC_GPU_COMMANDS_COMPLETE = 0x9117
+_GL_TIMEOUT_IGNORED = 0xFFFFFFFFFFFFFFFF
+
+# Frames over which view costs are averaged before they are logged.
+_STATS_FRAMES = 120
+
+_GLuint = ctypes.c_uint
+_GLint = ctypes.c_int
+_GLenum = ctypes.c_uint
+
+_SIGNATURES = {
+    "glGetIntegerv": (None, [_GLenum, ctypes.POINTER(_GLint)]),
+    "glGenTextures": (None, [ctypes.c_int, ctypes.POINTER(_GLuint)]),
+    "glDeleteTextures": (None, [ctypes.c_int, ctypes.POINTER(_GLuint)]),
+    "glBindTexture": (None, [_GLenum, _GLuint]),
+    "glTexParameteri": (None, [_GLenum, _GLenum, _GLint]),
+    "glTexImage2D": (None, [_GLenum, _GLint, _GLint, ctypes.c_int, ctypes.c_int, _GLint,
+                            _GLenum, _GLenum, ctypes.c_void_p]),
+    "glGenFramebuffers": (None, [ctypes.c_int, ctypes.POINTER(_GLuint)]),
+    "glDeleteFramebuffers": (None, [ctypes.c_int, ctypes.POINTER(_GLuint)]),
+    "glBindFramebuffer": (None, [_GLenum, _GLuint]),
+    "glFramebufferTexture2D": (None, [_GLenum, _GLenum, _GLenum, _GLuint, _GLint]),
+    "glBlitFramebuffer": (None, [_GLint] * 8 + [ctypes.c_uint, _GLenum]),
+    "glClearColor": (None, [ctypes.c_float] * 4),
+    "glClear": (None, [ctypes.c_uint]),
+    "glFlush": (None, []),
+    "glGenQueries": (None, [ctypes.c_int, ctypes.POINTER(_GLuint)]),
+    "glDeleteQueries": (None, [ctypes.c_int, ctypes.POINTER(_GLuint)]),
+    "glBeginQuery": (None, [_GLenum, _GLuint]),
+    "glEndQuery": (None, [_GLenum]),
+    "glGetQueryObjectiv": (None, [_GLuint, _GLenum, ctypes.POINTER(_GLint)]),
+    "glGetQueryObjectui64v": (None, [_GLuint, _GLenum, ctypes.POINTER(ctypes.c_uint64)]),
+    "glFenceSync": (ctypes.c_void_p, [_GLenum, ctypes.c_uint]),
+    "glWaitSync": (None, [ctypes.c_void_p, ctypes.c_uint, ctypes.c_uint64]),
+    "glDeleteSync": (None, [ctypes.c_void_p]),
+}
+
+
+class _GL:
+    """The handful of GL entry points the views need, loaded through EGL."""
+
+    def __init__(self):
+        egl = ctypes.CDLL("libEGL.so.1")
+        get_proc = egl.eglGetProcAddress
+        get_proc.restype = ctypes.c_void_p
+        get_proc.argtypes = [ctypes.c_char_p]
+        for name, (restype, argtypes) in _SIGNATURES.items():
+            address = get_proc(name.encode())
+            if not address:
+                raise OSError(f"GL function {name} is not available")
+            setattr(self, name, ctypes.CFUNCTYPE(restype, *argtypes)(address))
+
+    def gen(self, func):
+        value = _GLuint(0)
+        func(1, ctypes.byref(value))
+        return value.value
+
+    def delete(self, func, name):
+        if name:
+            func(1, ctypes.byref(_GLuint(name)))
+
+    def current_draw_fbo(self):
+        value = _GLint(0)
+        self.glGetIntegerv(_GL_DRAW_FRAMEBUFFER_BINDING, ctypes.byref(value))
+        return value.value
+
+
+_gl = None
+
+
+def _get_gl():
+    global _gl
+    if _gl is None:
+        _gl = _GL()
+    return _gl
+
+
+class _GpuTimer:
+    """GL_TIME_ELAPSED query read back one frame late, so it never stalls."""
+
+    def __init__(self, gl):
+        self._gl = gl
+        self._query = gl.gen(gl.glGenQueries)
+        self._pending = False
+
+    def begin(self):
+        self._gl.glBeginQuery(_GL_TIME_ELAPSED, self._query)
+
+    def end(self):
+        self._gl.glEndQuery(_GL_TIME_ELAPSED)
+        self._pending = True
+
+    def result(self):
+        """Seconds taken by the previous begin/end pair, or None if not ready."""
+        if not self._pending:
+            return None
+        available = _GLint(0)
+        self._gl.glGetQueryObjectiv(self._query, _GL_QUERY_RESULT_AVAILABLE, ctypes.byref(available))
+        if not available.value:
+            return None
+        elapsed = ctypes.c_uint64(0)
+        self._gl.glGetQueryObjectui64v(self._query, _GL_QUERY_RESULT, ctypes.byref(elapsed))
+        self._pending = False
+        return elapsed.value / 1e9
+
+    def free(self):
+        self._gl.delete(self._gl.glDeleteQueries, self._query)
+        self._query = 0
+
+
+class _CostMeter:
+    def __init__(self, label):
+        self.label = label
+        self.cpu = 0.0
+        self.gpu = 0.0
+        self._frames = 0
+        self._gpu_frames = 0
+        self._cpu_total = 0.0
+        self._gpu_total = 0.0
+
+    def add(self, cpu, gpu):
+        self._frames += 1
+        self._cpu_total += cpu
+        if gpu is not None:
+            self._gpu_frames += 1
+            self._gpu_total += gpu
+        if self._frames >= _STATS_FRAMES:
+            self.cpu = self._cpu_total / self._frames
+            self.gpu = self._gpu_total / self._gpu_frames if self._gpu_frames else 0.0
+            log.debug("%s: %.3f ms cpu, %.3f ms gpu per frame", self.label, self.cpu * 1000, self.gpu * 1000)
+            self._frames = self._gpu_frames = 0
+            self._cpu_total = self._gpu_total = 0.0
+
+
+class _Buffer:
+    def __init__(self):
+        self.texture = 0
+        self.fbo = 0
+        self.width = 0
+        self.height = 0
+        # Signalled once mpv has finished rendering into the texture.
+        self.ready = None
+        # One per view blit that read the texture; the producer waits on
+        # these before rendering into it again.
+        self.released = []
+
+
+class SharedFrame:
+    """The video as rendered for the extra views, in a texture they can read.
+
+    GTK 4 creates every GL context of a display sharing objects with the
+    others, so a texture filled in the main GLArea's context can be bound
+    from a view in another window. mpv decodes each frame once and, while
+    views are attached, renders it a second time into this texture at the
+    size of the largest view, so it does the scaling with its own scalers.
+
+    There are two textures. mpv renders into the back one while the views
+    read the front one, and fences go both ways: views wait for ``ready``
+    before reading, and the producer waits for the views' ``released``
+    fences before it renders into a texture again.
+    """
+
+    def __init__(self):
+        self.cost = _CostMeter("shared frame render")
+        self._buffers = (_Buffer(), _Buffer())
+        self._front = 0
+        self._timer = None
+        self._started = 0.0
+        self._gpu = None
+
+    @property
+    def front(self):
+        """The buffer holding the last complete frame."""
+        return self._buffers[self._front]
+
+    def begin(self, width, height):
+        """Prepare the back texture at ``width`` x ``height`` and return its FBO.
+
+        Must be called with the producing context current.
+        """
+        gl = _get_gl()
+        self._started = time.perf_counter()
+        if self._timer is None:
+            self._timer = _GpuTimer(gl)
+        self._gpu = self._timer.result()
+        back = self._buffers[1 - self._front]
+        for fence in back.released:
+            gl.glWaitSync(fence, 0, _GL_TIMEOUT_IGNORED)
+            gl.glDeleteSync(fence)
+        back.released.clear()
+        if not back.texture:
+            back.texture = gl.gen(gl.glGenTextures)
+            back.fbo = gl.gen(gl.glGenFramebuffers)
+        if (width, height) != (back.width, back.height):
+            gl.glBindTexture(_GL_TEXTURE_2D, back.texture)
+            gl.glTexParameteri(_GL_TEXTURE_2D, _GL_TEXTURE_MIN_FILTER, _GL_LINEAR)
+            gl.glTexParameteri(_GL_TEXTURE_2D, _GL_TEXTURE_MAG_FILTER, _GL_LINEAR)
+            gl.glTexImage2D(_GL_TEXTURE_2D, 0, _GL_RGBA8, width, height, 0, _GL_RGBA, _GL_UNSIGNED_BYTE, None)
+            gl.glBindTexture(_GL_TEXTURE_2D, 0)
+            gl.glBindFramebuffer(_GL_FRAMEBUFFER, back.fbo)
+            gl.glFramebufferTexture2D(_GL_FRAMEBUFFER, _GL_COLOR_ATTACHMENT0, _GL_TEXTURE_2D, back.texture, 0)
+            gl.glBindFramebuffer(_GL_FRAMEBUFFER, 0)
+            back.width, back.height = width, height
+        self._timer.begin()
+        return back.fbo
+
+    def publish(self):
+        """Fence the back texture and make it the front one."""
+        gl = _get_gl()
+        self._timer.end()
+        back = self._buffers[1 - self._front]
+        if back.ready:
+            gl.glDeleteSync(back.ready)
+        back.ready = gl.glFenceSync(_GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+        # The fence has to reach the GPU before another context waits on it.
+        gl.glFlush()
+        self._front = 1 - self._front
+        self.cost.add(time.perf_counter() - self._started, self._gpu)
+
+    def release(self, buffer):
+        """Record that the current context has queued its reads of ``buffer``."""
+        gl = _get_gl()
+        buffer.released.append(gl.glFenceSync(_GL_SYNC_GPU_COMMANDS_COMPLETE, 0))
+        gl.glFlush()
+
+    def free(self):
+        gl = _get_gl()
+        if self._timer:
+            self._timer.free()
+            self._timer = None
+        for buffer in self._buffers:
+            for fence in buffer.released + [buffer.ready]:
+                if fence:
+                    gl.glDeleteSync(fence)
+            gl.delete(gl.glDeleteFramebuffers, buffer.fbo)
+            gl.delete(gl.glDeleteTextures, buffer.texture)
+            buffer.__init__()
+        self._front = 0
+
+
+class VideoView(Gtk.GLArea):
+    """An extra view of the player's video, scaled to its own size."""
+
+    __gtype_name__ = "VideoView"
+
+    def __init__(self, player, label="view"):
+        super().__init__(hexpand=True, vexpand=True, auto_render=False)
+        self._player = player
+        self._fbo = 0
+        self._timer = None
+        self.cost = _CostMeter(label)
+        self.connect("realize", self._on_realize)
+        self.connect("unrealize", self._on_unrealize)
+        self.connect("render", self._on_render)
+
+    def _on_realize(self, area):
+        self.make_current()
+        if self.get_error():
+            return
+        gl = _get_gl()
+        self._fbo = gl.gen(gl.glGenFramebuffers)
+        self._timer = _GpuTimer(gl)
+        self._player.add_view(self)
+
+    def _on_unrealize(self, area):
+        self._player.remove_view(self)
+        self.make_current()
+        if self.get_error():
+            return
+        gl = _get_gl()
+        gl.delete(gl.glDeleteFramebuffers, self._fbo)
+        self._fbo = 0
+        if self._timer:
+            self._timer.free()
+            self._timer = None
+
+    def _on_render(self, area, context):
+        gl = _get_gl()
+        start = time.perf_counter()
+        gpu = self._timer.result()
+        frame = self._player.shared_frame
+        scale = self.get_scale_factor()
+        width, height = self.get_width() * scale, self.get_height() * scale
+        dst_fbo = gl.current_draw_fbo()
+
+        self._timer.begin()
+        gl.glClearColor(0.0, 0.0, 0.0, 1.0)
+        gl.glClear(_GL_COLOR_BUFFER_BIT)
+        buffer = frame.front
+        if buffer.texture and buffer.ready:
+            gl.glWaitSync(buffer.ready, 0, _GL_TIMEOUT_IGNORED)
+            gl.glBindFramebuffer(_GL_READ_FRAMEBUFFER, self._fbo)
+            gl.glFramebufferTexture2D(
+                _GL_READ_FRAMEBUFFER, _GL_COLOR_ATTACHMENT0, _GL_TEXTURE_2D, buffer.texture, 0,
+            )
+            # mpv already rendered at this view's size unless a larger view
+            # is attached too, in which case the frame is scaled down here.
+            dx0, dy0, dx1, dy1 = _fit(buffer.width, buffer.height, width, height)
+            gl.glBlitFramebuffer(
+                0, 0, buffer.width, buffer.height, dx0, dy0, dx1, dy1, _GL_COLOR_BUFFER_BIT, _GL_LINEAR,
+            )
+            gl.glBindFramebuffer(_GL_FRAMEBUFFER, dst_fbo)
+            frame.release(buffer)
+        self._timer.end()
+        self.cost.add(time.perf_counter() - start, gpu)
+        return True
+
+
+def _fit(src_w, src_h, dst_w, dst_h):
+    """Largest rectangle with the source aspect ratio centred in dst."""
+    scale = min(dst_w / src_w, dst_h / src_h)
+    w, h = int(src_w * scale), int(src_h * scale)
+    x, y = (dst_w - w) // 2, (dst_h - h) // 2
+    return x, y, x + w, y + h
@@ -1,3 +1,6 @@
+import logging
+import os
+
 import gi
 
 gi.require_version("Gtk", "4.0")
@@ -16,6 +19,11 @@ except (ValueError, ImportError):
 
 from gmpv.player import Player, _get_display_backend
 from gmpv.controls import ControlsBar
+from gmpv.export import ExportJob
+from gmpv.rpc import RpcServer
+from gmpv.views import VideoView
+
+log = logging.getLogger(__name__)
 
 _WINDOW_CSS = """
 .gmpv-window {
@@ -31,8 +39,18 @@ _WINDOW_CSS = """
 .gmpv-controls {
     transition: opacity 300ms ease;
 }
+.gmpv-stats {
+    background: alpha(black, 0.6);
+    border-radius: 8px;
+    padding: 8px 12px;
+    color: white;
+    font-family: monospace;
+    font-size: 11px;
+}
 """
 
+_STATS_INTERVAL_S = 1
+
 
 class GmpvWindow(Adw.ApplicationWindow):
     __gtype_name__ = "GmpvWindow"
@@ -52,11 +70,20 @@ class GmpvWindow(Adw.ApplicationWindow):
         self._last_mouse_x = -1.0
         self._last_mouse_y = -1.0
         self._click_timeout_id = None
+        self._mark_a = None
+        self._mark_b = None
+        self._exports = {}
+        self._pip_window = None
+        self._stats_update_id = None
         self._load_css()
         self._setup_ui()
         self._setup_keyboard()
         self._setup_drag_drop()
         self._setup_track_actions()
+        self._setup_speed_actions()
+        self._setup_export_actions()
+        self._setup_pip_action()
+        self._setup_rpc()
 
     def _load_css(self):
         provider = Gtk.CssProvider()
@@ -104,6 +131,19 @@ class GmpvWindow(Adw.ApplicationWindow):
         self._controls.set_can_target(False)
         self._overlay.add_overlay(self._controls)
 
+        # Stats overlay, toggled with i
+        self._stats_label = Gtk.Label(
+            halign=Gtk.Align.START,
+            valign=Gtk.Align.START,
+            margin_start=16,
+            margin_top=56,
+            xalign=0,
+            visible=False,
+            can_target=False,
+        )
+        self._stats_label.add_css_class("gmpv-stats")
+        self._overlay.add_overlay(self._stats_label)
+
         # Blank cursor for hiding during playback
         self._blank_cursor = Gdk.Cursor.new_from_name("none")
 
@@ -137,6 +177,8 @@ class GmpvWindow(Adw.ApplicationWindow):
         self._context_menu.set_has_arrow(False)
         menu = Gio.Menu()
         menu.append("Open File", "app.open")
+        menu.append("Export Segment", "win.export-segment")
+        menu.append("Picture-in-Picture", "win.pip")
         menu.append("About Gmpv", "app.about")
         menu.append("Quit", "app.quit")
         self._context_menu.set_menu_model(menu)
@@ -204,6 +246,38 @@ class GmpvWindow(Adw.ApplicationWindow):
             case Gdk.KEY_m | Gdk.KEY_M:
                 self._player.toggle_mute()
                 return True
+            case Gdk.KEY_bracketright:
+                self._player.speed_up()
+                return True
+            case Gdk.KEY_bracketleft:
+                self._player.slow_down()
+                return True
+            case Gdk.KEY_BackSpace:
+                self._player.set_speed(1.0)
+                return True
+            case Gdk.KEY_period:
+                self._player.frame_step()
+                return True
+            case Gdk.KEY_comma:
+                self._player.frame_back_step()
+                return True
+            case Gdk.KEY_a | Gdk.KEY_A:
+                self._set_marker("a")
+                return True
+            case Gdk.KEY_b | Gdk.KEY_B:
+                self._set_marker("b")
+                return True
+            case Gdk.KEY_i | Gdk.KEY_I:
+                self.toggle_stats()
+                return True
+            case Gdk.KEY_p | Gdk.KEY_P:
+                self.toggle_pip()
+                return True
+            case Gdk.KEY_r | Gdk.KEY_R:
+                self._player.toggle_reverse()
+                title = "Reverse playback" if self._player.reverse else "Forward playback"
+                self._toast_overlay.add_toast(Adw.Toast(title=title, timeout=1))
+                return True
             case Gdk.KEY_Escape:
                 if self._fullscreened:
                     self.toggle_fullscreen()
@@ -234,6 +308,111 @@ class GmpvWindow(Adw.ApplicationWindow):
         else:
             self._player.set_track(prop, int(value))
 
+    def _setup_speed_actions(self):
+        action = Gio.SimpleAction.new("set-speed", GLib.VariantType.new("s"))
+        action.connect("activate", self._on_set_speed)
+        self.add_action(action)
+
+    def _on_set_speed(self, action, param):
+        self._player.set_speed(float(param.get_string()))
+
+    def toggle_stats(self):
+        if self._stats_update_id:
+            GLib.source_remove(self._stats_update_id)
+            self._stats_update_id = None
+            self._stats_label.set_visible(False)
+            return
+        self._update_stats()
+        self._stats_label.set_visible(True)
+        self._stats_update_id = GLib.timeout_add_seconds(_STATS_INTERVAL_S, self._update_stats)
+
+    def _update_stats(self):
+        stats = self._player.get_stats()
+        width = max((len(label) for label, _ in stats), default=0)
+        self._stats_label.set_label("\n".join(f"{label:<{width}}  {value}" for label, value in stats))
+        return True
+
+    def _setup_pip_action(self):
+        action = Gio.SimpleAction.new("pip", None)
+        action.connect("activate", lambda action, param: self.toggle_pip())
+        self.add_action(action)
+
+    def toggle_pip(self):
+        """Open or close a mini window showing the same decoded video."""
+        if self._pip_window:
+            self._pip_window.close()
+            return
+        if self._player.backend != "wayland":
+            self._toast_overlay.add_toast(
+                Adw.Toast(title="Picture-in-picture needs the Wayland backend", timeout=2)
+            )
+            return
+        self._pip_window = Gtk.Window(title="Gmpv", default_width=384, default_height=216)
+        self._pip_window.add_css_class("gmpv-window")
+        self._pip_window.set_child(VideoView(self._player, label="picture-in-picture"))
+        self._pip_window.connect("close-request", self._on_pip_close)
+        self._pip_window.present()
+
+    def _on_pip_close(self, window):
+        self._pip_window = None
+        return False
+
+    def _setup_export_actions(self):
+        action = Gio.SimpleAction.new("export-segment", None)
+        action.connect("activate", self._on_export_segment)
+        self.add_action(action)
+
+    def _set_marker(self, which):
+        if not self._has_file:
+            return
+        if which == "a":
+            self._mark_a = self._player.position
+        else:
+            self._mark_b = self._player.position
+        self._controls.set_markers(self._mark_a, self._mark_b)
+        self._show_controls()
+
+    def _on_export_segment(self, action, param):
+        source = self._player.path
+        if not source or not os.path.isabs(source):
+            self._toast_overlay.add_toast(Adw.Toast(title="Only local files can be exported", timeout=2))
+            return
+        if self._mark_a is None or self._mark_b is None or self._mark_b <= self._mark_a:
+            self._toast_overlay.add_toast(Adw.Toast(title="Set A and B markers first (a, b)", timeout=2))
+            return
+        try:
+            job = ExportJob(source, self._mark_a, self._mark_b)
+        except OSError as e:
+            self._toast_overlay.add_toast(Adw.Toast(title=f"Export failed: {e.strerror}", timeout=4))
+            return
+        toast = Adw.Toast(title=f"Exporting {os.path.basename(job.output)}", timeout=0)
+        self._exports[job] = toast
+        job.connect("progress", self._on_export_progress)
+        job.connect("finished", self._on_export_finished)
+        self._toast_overlay.add_toast(toast)
+        job.run()
+
+    def _on_export_progress(self, job, fraction):
+        self._exports[job].set_title(
+            f"Exporting {os.path.basename(job.output)} — {fraction:.0%} ({job.speed:.1f}× realtime)"
+        )
+
+    def _on_export_finished(self, job, ok, message):
+        self._exports.pop(job).dismiss()
+        if ok:
+            title = f"Exported {os.path.basename(job.output)} at {job.speed:.1f}× realtime"
+        else:
+            title = f"Export failed: {message}"
+        self._toast_overlay.add_toast(Adw.Toast(title=title, timeout=4))
+
+    def _setup_rpc(self):
+        self._rpc = RpcServer(self._player)
+        try:
+            self._rpc.start()
+        except OSError as e:
+            log.warning("remote control disabled: %s", e)
+            self._rpc = None
+
     def toggle_fullscreen(self):
         if self._fullscreened:
             self.unfullscreen()
@@ -248,6 +427,9 @@ class GmpvWindow(Adw.ApplicationWindow):
 
     def _on_file_loaded(self, player):
         self._has_file = True
+        self._mark_a = None
+        self._mark_b = None
+        self._controls.set_markers(None, None)
         self._show_controls()
 
     def _on_click_released(self, gesture, n_press, x, y):
@@ -336,5 +518,14 @@ class GmpvWindow(Adw.ApplicationWindow):
             self._toast_overlay.add_toast(toast)
 
     def do_close_request(self):
+        if self._stats_update_id:
+            GLib.source_remove(self._stats_update_id)
+            self._stats_update_id = None
+        if self._pip_window:
+            self._pip_window.destroy()
+        for job in list(self._exports):
+            job.cancel()
+        if self._rpc:
+            self._rpc.stop()
         self._player.shutdown()
         return False
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Measure glass-to-playhead latency of gmpv's live mode.
+
+Starts ffmpeg sending an MPEG-TS test pattern over UDP on localhost with
+the wall-clock time embedded as each frame's PTS, plays it headless with
+the same options ``Player`` uses for live streams, and compares the
+playhead against the wall clock.
+
+    ./tools/live_latency.py --seconds 30
+    ./tools/live_latency.py --baseline   # mpv defaults, for comparison
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(_root, "src"))
+
+import mpv
+
+from gmpv.live import LIVE_OPTIONS, LiveCatchup
+
+# MPEG-TS timestamps are 33-bit at 90 kHz and wrap roughly every 26.5 hours.
+_PTS_WRAP = 2 ** 33 / 90000
+
+
+def _start_sender(port, fps):
+    return subprocess.Popen(
+        [
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-re",
+            "-f", "lavfi", "-i", f"testsrc2=size=640x360:rate={fps}",
+            "-vf", "settb=1/90000,setpts=RTCTIME*9/100",
+            "-c:v", "libx264", "-preset", "ultrafast", "-tune", "zerolatency",
+            "-g", str(fps), "-copyts", "-muxdelay", "0", "-muxpreload", "0",
+            "-f", "mpegts", f"udp://127.0.0.1:{port}?pkt_size=1316",
+        ],
+        stdin=subprocess.DEVNULL,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=23000)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--baseline", action="store_true",
+                        help="play with mpv's default buffering instead of live mode")
+    args = parser.parse_args()
+
+    sender = _start_sender(args.port, args.fps)
+    player = mpv.MPV(vo="null", ao="null", rebase_start_time="no", keep_open="yes")
+    catchup = LiveCatchup()
+    samples = []
+    try:
+        options = {} if args.baseline else LIVE_OPTIONS
+        player.loadfile(f"udp://127.0.0.1:{args.port}", **options)
+        deadline = time.monotonic() + args.seconds
+        while time.monotonic() < deadline:
+            time.sleep(0.1)
+            pos = player.time_pos
+            if pos is None:
+                continue
+            samples.append((time.time() % _PTS_WRAP) - pos)
+            if not args.baseline:
+                buffered = player.demuxer_cache_duration
+                if buffered is not None:
+                    speed, drop = catchup.update(buffered)
+                    if drop:
+                        player.command("drop-buffers")
+                    player.speed = speed
+    finally:
+        player.terminate()
+        sender.terminate()
+        sender.wait()
+
+    if not samples:
+        print("no frames received", file=sys.stderr)
+        return 1
+    # Skip the first second while the demuxer probes the stream.
+    steady = samples[10:] or samples
+    print(f"mode:    {'baseline' if args.baseline else 'live'}")
+    print(f"samples: {len(steady)}")
+    print(f"median:  {statistics.median(steady) * 1000:.0f} ms")
+    print(f"p95:     {sorted(steady)[max(int(len(steady) * 0.95) - 1, 0)] * 1000:.0f} ms")
+    print(f"max:     {max(steady) * 1000:.0f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""Load generator for gmpv's remote-control socket.
+
+Opens many concurrent clients against a running gmpv, sends requests as
+fast as each client gets its responses back and reports round-trip
+latency. A few clients can subscribe to every property and read slowly,
+to check that they do not hold up everyone else.
+
+By default two runs are reported. The first, get_property, is answered
+on the server's asyncio thread and measures socket and JSON overhead. The
+second, set_volume with the current volume, goes through the GTK main
+loop like every Player command but changes nothing.
+
+    ./tools/rpc_load.py --clients 50 --requests 200
+    ./tools/rpc_load.py --method seek --params '[0]' --slow 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+
+def _default_socket():
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or f"/run/user/{os.getuid()}"
+    return os.path.join(runtime_dir, "gmpv.sock")
+
+
+async def _client(path, method, params, requests, latencies):
+    reader, writer = await asyncio.open_unix_connection(path)
+    try:
+        for i in range(requests):
+            start = time.perf_counter()
+            writer.write(json.dumps({"jsonrpc": "2.0", "id": i, "method": method, "params": params}).encode() + b"\n")
+            await writer.drain()
+            while True:
+                message = json.loads(await reader.readline())
+                if isinstance(message, dict) and message.get("id") == i:
+                    break
+            if "error" in message:
+                raise RuntimeError(message["error"]["message"])
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+async def _slow_subscriber(path, stop):
+    reader, writer = await asyncio.open_unix_connection(path)
+    names = ["position", "duration", "paused", "volume", "tracks"]
+    writer.write(json.dumps({"jsonrpc": "2.0", "id": 0, "method": "subscribe",
+                             "params": {"names": names}}).encode() + b"\n")
+    await writer.drain()
+    while not stop.is_set():
+        await asyncio.sleep(1.0)
+        await reader.readline()
+    writer.close()
+
+
+async def _request(path, method, params):
+    reader, writer = await asyncio.open_unix_connection(path)
+    try:
+        writer.write(json.dumps({"jsonrpc": "2.0", "id": 0, "method": method, "params": params}).encode() + b"\n")
+        await writer.drain()
+        while True:
+            message = json.loads(await reader.readline())
+            if isinstance(message, dict) and message.get("id") == 0:
+                return message.get("result")
+    finally:
+        writer.close()
+
+
+async def _runs(args):
+    if args.method:
+        return [(args.method, await _run(args, args.method, json.loads(args.params)))]
+    volume = await _request(args.socket, "get_property", ["volume"])
+    return [
+        ("get_property (rpc thread)", await _run(args, "get_property", ["position"])),
+        ("set_volume (main loop)", await _run(args, "set_volume", [volume])),
+    ]
+
+
+async def _run(args, method, params):
+    latencies = []
+    stop = asyncio.Event()
+    slow = [asyncio.create_task(_slow_subscriber(args.socket, stop)) for _ in range(args.slow)]
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _client(args.socket, method, params, args.requests, latencies)
+        for _ in range(args.clients)
+    ))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    for task in slow:
+        task.cancel()
+    return latencies, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--socket", default=_default_socket())
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=100, help="requests per client")
+    parser.add_argument("--method", help="only measure this method (default: get_property and set_volume)")
+    parser.add_argument("--params", default="[]", help="JSON params for --method")
+    parser.add_argument("--slow", type=int, default=0, help="slow subscribers to run alongside")
+    args = parser.parse_args()
+
+    for name, (latencies, elapsed) in asyncio.run(_runs(args)):
+        ms = sorted(x * 1000 for x in latencies)
+        print(f"{name}:")
+        print(f"  requests:   {len(ms)} from {args.clients} clients in {elapsed:.2f} s")
+        print(f"  throughput: {len(ms) / elapsed:.0f} req/s")
+        print(f"  median:     {statistics.median(ms):.2f} ms")
+        print(f"  p95:        {ms[max(int(len(ms) * 0.95) - 1, 0)]:.2f} ms")
+        print(f"  p99:        {ms[max(int(len(ms) * 0.99) - 1, 0)]:.2f} ms")
+        print(f"  max:        {ms[-1]:.2f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())